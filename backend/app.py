@@ -1,47 +1,100 @@
 from flask import Flask, request, Response, stream_with_context, jsonify
 from flask_cors import CORS
-from langchain_openai import ChatOpenAI
-from langchain_anthropic import ChatAnthropic
-from langchain_ollama import ChatOllama
-from langchain_core.messages import HumanMessage, SystemMessage, AIMessage, ToolMessage
+from langchain_core.messages import HumanMessage, SystemMessage, AIMessage, AIMessageChunk, ToolMessage
 from langchain_core.output_parsers import StrOutputParser
 from dotenv import load_dotenv
-import json
+from concurrent.futures import ThreadPoolExecutor, wait
+import functools
+import math
 import os
-from database import db, Tool, init_db
-from tools import get_enabled_tools, build_tool_context
+import threading
+import uuid
+import orjson
+from database import db, SyncTask, Tool, init_db
+from tools import prepare_tools
 from mcp_manager import mcp_manager
-from auth import require_auth, optional_auth
+from auth import init_auth, require_auth, optional_auth
+from sse import ContentBatcher, DONE_FRAME, KEEPALIVE_FRAME, OPEN_FRAME, content_event, sse_event, with_keepalive
+from json_provider import OrjsonProvider
+from event_loop import submit
+from response_cache import ResponseCache
 
 load_dotenv()
 
 app = Flask(__name__)
+app.json = OrjsonProvider(app)
 CORS(app)
+init_auth(app)
+
+# Reject oversized request bodies before they are read or parsed
+app.config['MAX_CONTENT_LENGTH'] = 1024 * 1024
 
 # Database configuration
 app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///tools.db'
 app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
+    'pool_size': 32,
+    'max_overflow': 64,
+    'pool_pre_ping': True,
+    'pool_recycle': 1800,
+}
 
 # Initialize database
 init_db(app)
 
-# Sync MCP tools after database initialization
-try:
-    sync_result = mcp_manager.sync_tools_to_database(app)
-    if sync_result['errors']:
-        print(f"Warning: Some MCP tools failed to sync: {sync_result['errors']}")
-    if sync_result['tools_added'] > 0:
-        print(f"Added {sync_result['tools_added']} MCP tools")
-except Exception as e:
-    print(f"Warning: Failed to sync MCP tools: {str(e)}")
+# Sync MCP tools after database initialization (set ENABLE_MCP=0 to skip
+# connecting to every configured MCP server on startup)
+ENABLE_MCP = os.getenv("ENABLE_MCP", "1") == "1"
+
+if ENABLE_MCP:
+    try:
+        sync_result = mcp_manager.sync_tools_to_database(app)
+        if sync_result['errors']:
+            print(f"Warning: Some MCP tools failed to sync: {sync_result['errors']}")
+        if sync_result['tools_added'] > 0:
+            print(f"Added {sync_result['tools_added']} MCP tools")
+    except Exception as e:
+        print(f"Warning: Failed to sync MCP tools: {str(e)}")
 
 # Configuration
 LLM_PROVIDER = os.getenv("LLM_PROVIDER", "openai").lower()
 TEMPERATURE = float(os.getenv("TEMPERATURE", "0.7"))
 
+# Streamed content is coalesced into SSE frames. The first frame carries
+# SSE_MIN_BATCH chunks and the batch grows by SSE_BATCH_GROWTH per frame up to
+# SSE_MAX_BATCH; pending content is sent after SSE_FLUSH_MS milliseconds.
+SSE_MIN_BATCH = int(os.getenv("SSE_MIN_BATCH", "1"))
+SSE_MAX_BATCH = int(os.getenv("SSE_MAX_BATCH", "50"))
+SSE_BATCH_GROWTH = float(os.getenv("SSE_BATCH_GROWTH", "3"))
+SSE_FLUSH_MS = float(os.getenv("SSE_FLUSH_MS", "40"))
+# Upper bound for a client-requested max_batch_size
+SSE_BATCH_LIMIT = 1000
+
+# Context window of the configured model in tokens. Prompts that cannot fit are
+# rejected before calling the provider (OpenAI only; 0 disables the check)
+CONTEXT_WINDOW_TOKENS = int(os.getenv("CONTEXT_WINDOW_TOKENS", "0"))
+# Tokens kept free in the context window for the model's reply
+RESPONSE_TOKEN_RESERVE = 256
+
+# Seconds to reuse the answer to an identical prompt that needed no tools
+# (0 disables the cache)
+RESPONSE_CACHE_TTL = float(os.getenv("RESPONSE_CACHE_TTL", "0"))
+response_cache = ResponseCache(RESPONSE_CACHE_TTL) if RESPONSE_CACHE_TTL > 0 else None
+# Cached answers are replayed in pieces of this many characters
+CACHED_CHUNK_CHARS = 64
+
+# Seconds without output from the LLM after which a keepalive comment is sent
+SSE_KEEPALIVE_SECONDS = float(os.getenv("SSE_KEEPALIVE_SECONDS", "15"))
+
 def get_llm():
-    """Initialize and return the appropriate LLM based on configuration."""
+    """Initialize and return the appropriate LLM based on configuration.
+
+    Provider SDKs are imported inside their branch so a process only loads the
+    one it actually uses.
+    """
     if LLM_PROVIDER == "claude" or LLM_PROVIDER == "anthropic":
+        from langchain_anthropic import ChatAnthropic
+
         model = os.getenv("ANTHROPIC_MODEL", "claude-3-5-sonnet-20241022")
         api_key = os.getenv("ANTHROPIC_API_KEY")
         if not api_key:
@@ -53,17 +106,31 @@ def get_llm():
             anthropic_api_key=api_key
         )
     elif LLM_PROVIDER == "openai":
+        import httpx
+        from langchain_openai import ChatOpenAI
+
         model = os.getenv("OPENAI_MODEL", "gpt-3.5-turbo")
         api_key = os.getenv("OPENAI_API_KEY")
         if not api_key:
             raise ValueError("OPENAI_API_KEY environment variable is required for OpenAI")
+        # One pooled HTTP/2 client is shared by every request, so concurrent
+        # streams multiplex over already-open TLS connections.
+        http_client = httpx.Client(
+            http2=True,
+            limits=httpx.Limits(max_connections=200, max_keepalive_connections=100),
+            timeout=httpx.Timeout(600.0, connect=5.0),
+        )
         return ChatOpenAI(
             model=model,
             temperature=TEMPERATURE,
             streaming=True,
-            openai_api_key=api_key
+            openai_api_key=api_key,
+            http_client=http_client,
+            stream_usage=True
         )
     elif LLM_PROVIDER == "ollama":
+        from langchain_ollama import ChatOllama
+
         model = os.getenv("OLLAMA_MODEL", "llama3.2")
         base_url = os.getenv("OLLAMA_BASE_URL", "http://localhost:11434")
         return ChatOllama(
@@ -77,33 +144,278 @@ def get_llm():
 # Initialize LangChain LLM with streaming
 llm = get_llm()
 
+# Anthropic streams content as a list of typed blocks; OpenAI and Ollama stream plain strings
+CONTENT_IS_BLOCKS = LLM_PROVIDER == "claude" or LLM_PROVIDER == "anthropic"
+
+def _flatten_content_blocks(content) -> str:
+    """Join the text of a chunk's content blocks, skipping tool-use blocks."""
+    if isinstance(content, str):
+        return content
+    return ''.join(
+        block.get('text', '') if isinstance(block, dict) else str(block)
+        for block in content
+    )
+
 parser = StrOutputParser()
 
+BASE_SYSTEM_PROMPT = "You are a helpful AI assistant."
+
+# The enabled tools, the LLM bound to them and the system prompt built from
+# them only change when the tool configuration does, so they are computed once
+# per state of the tools table, keyed by _tools_fingerprint().
+_tools_cache = {}
+_tools_cache_lock = threading.Lock()
+# Serialized GET /tools response body, keyed the same way
+_tools_body = {}
+
+def invalidate_tools_cache():
+    """Discard the cached tool setup after the tool configuration changed."""
+    with _tools_cache_lock:
+        _tools_cache.clear()
+        _tools_body.clear()
+
+def _tools_fingerprint():
+    """Return (latest updated_at, row count) of the tools table.
+
+    Every insert, update and delete changes one of the two, including writes
+    made by other workers, so caches keyed on it stay consistent across
+    processes.
+    """
+    return tuple(db.session.execute(db.select(db.func.max(Tool.updated_at), db.func.count(Tool.id))).one())
+
+def get_tool_setup():
+    """Return (tool_map, llm_with_tools, system_content) for the current tool configuration."""
+    fingerprint = _tools_fingerprint()
+    cached = _tools_cache.get(fingerprint)
+    if cached is not None:
+        return cached
+
+    with _tools_cache_lock:
+        cached = _tools_cache.get(fingerprint)
+        if cached is None:
+            _tools_cache.clear()
+            # Order by id so the system prompt and tool schemas come out byte-identical
+            # across rebuilds, which provider-side prompt caching relies on
+            # Plain row mappings rather than ORM instances converted with to_dict()
+            query = Tool.list_dicts_query().where(Tool.enabled.is_(True)).order_by(Tool.id)
+            tool_configs = [dict(row) for row in db.session.execute(query).mappings()]
+
+            if not tool_configs:
+                # Nothing enabled: use the bare LLM and base prompt without building anything
+                cached = ({}, llm, BASE_SYSTEM_PROMPT)
+                _tools_cache[fingerprint] = cached
+                return cached
+
+            # Enabled tools and their custom prompts, collected in one pass
+            tools, tool_context = prepare_tools(tool_configs)
+
+            # Build a map of tool name -> tool function for execution
+            tool_map = {t.name: t for t in tools}
+
+            # Bind tools to the LLM if tools are available
+            llm_with_tools = llm.bind_tools(tools) if tools else llm
+
+            # Build system message with tool context
+            if tool_context:
+                system_content = f"{BASE_SYSTEM_PROMPT}\n\n{tool_context}"
+            else:
+                system_content = BASE_SYSTEM_PROMPT
+
+            cached = (tool_map, llm_with_tools, system_content)
+            _tools_cache[fingerprint] = cached
+    return cached
+
+@functools.lru_cache(maxsize=32)
+def _system_message(content: str) -> SystemMessage:
+    """Return a shared SystemMessage for a system prompt, built once per distinct prompt.
+
+    The system prompt is the same for every user, so on Anthropic it is marked
+    as a cache breakpoint. OpenAI caches long shared prefixes automatically.
+    Per-request content must come after this message to keep the prefix cacheable.
+    """
+    if LLM_PROVIDER == "claude" or LLM_PROVIDER == "anthropic":
+        return SystemMessage(content=[
+            {"type": "text", "text": content, "cache_control": {"type": "ephemeral"}}
+        ])
+    return SystemMessage(content=content)
+
+@functools.lru_cache(maxsize=1)
+def _token_encoder():
+    """Return the tiktoken encoding for the configured OpenAI model, or None if prompts can't be counted locally."""
+    if LLM_PROVIDER != "openai" or not CONTEXT_WINDOW_TOKENS:
+        return None
+    try:
+        import tiktoken
+        try:
+            return tiktoken.encoding_for_model(os.getenv("OPENAI_MODEL", "gpt-3.5-turbo"))
+        except KeyError:
+            return tiktoken.get_encoding("cl100k_base")
+    except Exception as e:
+        print(f"Warning: Could not load tiktoken encoding, prompt length check disabled: {e}")
+        return None
+
+@functools.lru_cache(maxsize=32)
+def _system_tokens(content: str) -> int:
+    """Return the token count of a system prompt, counted once per distinct prompt."""
+    return len(_token_encoder().encode(content))
+
+def merge_tool_call_chunks(parts, tool_call_chunks):
+    """Merge streamed tool call deltas into ``parts``, keyed by the tool call's index.
+
+    Argument fragments are concatenated; the id and name arrive on the first
+    delta for an index. Deltas without an index are complete calls on their own.
+    """
+    for tool_call_chunk in tool_call_chunks:
+        index = tool_call_chunk.get('index')
+        part = parts.get(index) if index is not None else None
+        if part is None:
+            parts[index if index is not None else ('unindexed', len(parts))] = {
+                'name': tool_call_chunk.get('name'),
+                'args': tool_call_chunk.get('args') or '',
+                'id': tool_call_chunk.get('id'),
+                'index': index,
+            }
+            continue
+        if tool_call_chunk.get('args'):
+            part['args'] += tool_call_chunk['args']
+        if not part['name'] and tool_call_chunk.get('name'):
+            part['name'] = tool_call_chunk['name']
+        if not part['id'] and tool_call_chunk.get('id'):
+            part['id'] = tool_call_chunk['id']
+
+async def _invoke_tool(tool_map, tool_name, tool_args) -> str:
+    """Run one tool call and return its output, or the error message if it fails."""
+    tool_func = tool_map.get(tool_name)
+    if tool_func is None:
+        return f"Tool '{tool_name}' not found"
+    try:
+        return str(await tool_func.ainvoke(tool_args))
+    except Exception as e:
+        return f"Error executing tool: {str(e)}"
+
+def start_tool_call(tool_map, tool_name, tool_args):
+    """Start a tool call on the background loop and return a future for its output."""
+    return submit(_invoke_tool(tool_map, tool_name, tool_args))
+
+def start_completed_tool_calls(tool_map, parts, started):
+    """Start every merged tool call except the last, which may still be streaming.
+
+    Providers stream tool calls one index at a time, so once a later index
+    appears the earlier calls are complete. Started futures are recorded in
+    ``started`` by tool call id.
+    """
+    for key in list(parts)[:-1]:
+        part = parts[key]
+        if not part['id'] or part['id'] in started:
+            continue
+        parsed = AIMessageChunk(content='', tool_call_chunks=[part]).tool_calls
+        if parsed and parsed[0]['name']:
+            started[part['id']] = start_tool_call(tool_map, parsed[0]['name'], parsed[0]['args'])
+
+def warm_tool_setup():
+    """Build the tool setup ahead of time so the next chat request doesn't pay for it."""
+    try:
+        with app.app_context():
+            _, _, system_content = get_tool_setup()
+        _system_message(system_content)
+    except Exception as e:
+        print(f"Warning: Failed to prepare tools: {str(e)}")
+
+warm_tool_setup()
+
+def _json_body():
+    """Return the request's JSON object, or {} if the body is missing, malformed or not an object."""
+    data = request.get_json(silent=True)
+    return data if isinstance(data, dict) else {}
+
+# Load balancers poll /health constantly, so its body is encoded once
+_HEALTH_BODY = b'{"status":"healthy"}'
+
 @app.route('/health', methods=['GET'])
 def health():
-    return {'status': 'healthy'}, 200
+    return app.response_class(_HEALTH_BODY, mimetype='application/json')
 
 @app.route('/tools', methods=['GET'])
 @require_auth
 def get_tools():
     """Get all available tools with their configurations."""
-    tools = Tool.query.all()
-    return jsonify([tool.to_dict() for tool in tools]), 200
+    fingerprint = _tools_fingerprint()
+    body = _tools_body.get(fingerprint)
+    if body is None:
+        # Plain rows instead of ORM objects; orjson serializes the datetimes,
+        # rather than calling to_dict() on every tool
+        body = orjson.dumps(Tool.list_dicts())
+        with _tools_cache_lock:
+            _tools_body.clear()
+            _tools_body[fingerprint] = body
+    return app.response_class(body, mimetype='application/json'), 200
 
 @app.route('/tools/<int:tool_id>', methods=['PUT'])
 @require_auth
 def update_tool(tool_id):
     """Update a tool's custom context and enabled status."""
     tool = Tool.query.get_or_404(tool_id)
-    data = request.json
+    data = _json_body()
 
     if 'custom_context' in data:
         tool.custom_context = data['custom_context']
     if 'enabled' in data:
         tool.enabled = data['enabled']
 
+    # Build the response before committing; commit expires the instance and
+    # to_dict() would otherwise reload the row
+    db.session.flush()
+    tool_dict = tool.to_dict()
+    db.session.commit()
+    invalidate_tools_cache()
+    return jsonify(tool_dict), 200
+
+# MCP syncs connect to every server and can take seconds, so they run in the
+# background and clients poll for the result. A single worker keeps syncs from
+# racing each other on the tools table. Task status lives in the database so a
+# poll can be answered by any worker.
+_sync_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='mcp-sync')
+MAX_SYNC_TASKS = 100
+
+def _run_sync_task(task_id, server_name=None, force_refresh=False):
+    """Sync MCP tools to the database and record the outcome on the task."""
+    with app.app_context():
+        db.session.get(SyncTask, task_id).status = 'running'
+        db.session.commit()
+
+    try:
+        sync_result = mcp_manager.sync_tools_to_database(app, server_name=server_name, force_refresh=force_refresh)
+        invalidate_tools_cache()
+        warm_tool_setup()
+        update = {
+            'status': 'completed',
+            'tools_added': sync_result['tools_added'],
+            'tools_removed': sync_result['tools_removed'],
+            'warnings': sync_result['errors'] or None
+        }
+    except Exception as e:
+        update = {'status': 'failed', 'error': f'Failed to sync tools: {str(e)}'}
+
+    with app.app_context():
+        SyncTask.query.filter_by(task_id=task_id).update(update)
+        db.session.commit()
+
+def start_sync_task(server_name=None, force_refresh=False):
+    """Queue a background MCP tool sync and return its task id."""
+    task_id = uuid.uuid4().hex
+    db.session.add(SyncTask(task_id=task_id, status='queued'))
+    # Forget the oldest finished tasks so the table stays bounded; queued and
+    # running tasks are kept so they can still be polled
+    finished = (
+        db.select(SyncTask.task_id)
+        .where(SyncTask.status.in_(('completed', 'failed')))
+        .order_by(SyncTask.created_at.desc())
+        .offset(MAX_SYNC_TASKS)
+    )
+    SyncTask.query.filter(SyncTask.task_id.in_(finished)).delete(synchronize_session=False)
     db.session.commit()
-    return jsonify(tool.to_dict()), 200
+    _sync_executor.submit(_run_sync_task, task_id, server_name, force_refresh)
+    return task_id
 
 @app.route('/mcp-servers', methods=['GET'])
 @require_auth
@@ -115,7 +427,7 @@ def get_mcp_servers():
 @require_auth
 def add_mcp_server():
     """Add a new MCP server."""
-    data = request.json
+    data = _json_body()
     name = data.get('name')
     transport = data.get('transport', 'stdio')
 
@@ -145,18 +457,14 @@ def add_mcp_server():
         else:
             return {'error': f'Unsupported transport type: {transport}'}, 400
 
-        # Sync tools from new server
-        sync_result = mcp_manager.sync_tools_to_database(app, server_name=name)
+        # Sync tools from the new server in the background
+        task_id = start_sync_task(server_name=name)
 
-        response = {
+        return {
             'message': 'MCP server added successfully',
-            'tools_added': sync_result['tools_added']
-        }
-
-        if sync_result['errors']:
-            response['warnings'] = sync_result['errors']
-
-        return response, 201
+            'task_id': task_id,
+            'status': 'queued'
+        }, 202
     except Exception as e:
         return {'error': f'Failed to add server: {str(e)}'}, 500
 
@@ -168,6 +476,7 @@ def delete_mcp_server(server_name):
         # Remove associated tools from database
         Tool.query.filter_by(source='mcp', mcp_server_name=server_name).delete()
         db.session.commit()
+        invalidate_tools_cache()
         return {'message': 'MCP server deleted successfully'}, 200
     return {'error': 'MCP server not found'}, 404
 
@@ -175,59 +484,80 @@ def delete_mcp_server(server_name):
 @require_auth
 def sync_mcp_servers():
     """Manually trigger MCP tool sync."""
-    try:
-        sync_result = mcp_manager.sync_tools_to_database(app)
-        response = {
-            'message': 'MCP tools synced successfully',
-            'tools_added': sync_result['tools_added'],
-            'tools_removed': sync_result['tools_removed']
-        }
-        if sync_result['errors']:
-            response['warnings'] = sync_result['errors']
-        return response, 200
-    except Exception as e:
-        return {'error': f'Failed to sync tools: {str(e)}'}, 500
+    # A manual sync asks every server again rather than reusing cached discovery
+    task_id = start_sync_task(force_refresh=True)
+    return {'message': 'MCP tool sync started', 'task_id': task_id, 'status': 'queued'}, 202
+
+@app.route('/mcp-servers/sync/<task_id>', methods=['GET'])
+@require_auth
+def get_sync_task(task_id):
+    """Get the status of a background MCP tool sync."""
+    task = db.session.get(SyncTask, task_id)
+    if task is None:
+        return {'error': 'Sync task not found'}, 404
+    return task.to_dict(), 200
 
 @app.route('/chat', methods=['POST'])
 @require_auth
 def chat():
-    data = request.json
+    data = _json_body()
     user_message = data.get('message', '')
 
     if not user_message:
         return {'error': 'No message provided'}, 400
 
-    def generate():
-        try:
-            # Get enabled tools from database
-            tools_query = Tool.query.filter_by(enabled=True).all()
-            tool_configs = [tool.to_dict() for tool in tools_query]
+    # Clients may tune the streaming batch sizes per request
+    try:
+        min_batch = int(data.get('min_batch_size', SSE_MIN_BATCH))
+        max_batch = int(data.get('max_batch_size', SSE_MAX_BATCH))
+        growth_factor = float(data.get('batch_size_growth_factor', SSE_BATCH_GROWTH))
+    except (TypeError, ValueError):
+        return {'error': 'Batch size parameters must be numbers'}, 400
 
-            # Get tool functions
-            tools = get_enabled_tools(tool_configs)
+    if not math.isfinite(growth_factor):
+        return {'error': 'batch_size_growth_factor must be a finite number'}, 400
 
-            # Build a map of tool name -> tool function for execution
-            tool_map = {t.name: t for t in tools}
+    if min_batch < 1 or max_batch < min_batch or max_batch > SSE_BATCH_LIMIT or growth_factor < 1:
+        return {'error': f'Batch sizes must satisfy 1 <= min_batch_size <= max_batch_size <= {SSE_BATCH_LIMIT} and batch_size_growth_factor >= 1'}, 400
 
-            # Build system message with tool context
-            base_context = "You are a helpful AI assistant."
-            tool_context = build_tool_context(tool_configs)
+    # Load the tool setup before streaming starts and hand the connection back
+    # to the pool, so it is not held for the whole LLM generation.
+    try:
+        tool_map, llm_with_tools, system_content = get_tool_setup()
+    except Exception as e:
+        return {'error': f'Failed to load tools: {str(e)}'}, 500
+    finally:
+        db.session.close()
 
-            if tool_context:
-                system_content = f"{base_context}\n\n{tool_context}"
-            else:
-                system_content = base_context
+    # Reject prompts that can't fit the context window without a provider round-trip
+    encoder = _token_encoder()
+    if encoder is not None:
+        prompt_tokens = _system_tokens(system_content) + len(encoder.encode(user_message))
+        if prompt_tokens > CONTEXT_WINDOW_TOKENS - RESPONSE_TOKEN_RESERVE:
+            return {'error': 'Message is too long for the model context window', 'tokens': prompt_tokens}, 413
+
+    def generate():
+        batcher = ContentBatcher(min_batch, max_batch, growth_factor, SSE_FLUSH_MS)
+        yield OPEN_FRAME
+        try:
+            # Replay a cached answer to the same prompt without calling the LLM
+            cache_key = None
+            if response_cache is not None:
+                cache_key = response_cache.key(system_content, user_message)
+                cached_text = response_cache.get(cache_key)
+                if cached_text is not None:
+                    for i in range(0, len(cached_text), CACHED_CHUNK_CHARS):
+                        yield content_event(cached_text[i:i + CACHED_CHUNK_CHARS])
+                    yield DONE_FRAME
+                    return
 
             messages = [
-                SystemMessage(content=system_content),
+                _system_message(system_content),
                 HumanMessage(content=user_message)
             ]
 
-            # Bind tools to the LLM if tools are available
-            if tools:
-                llm_with_tools = llm.bind_tools(tools)
-            else:
-                llm_with_tools = llm
+            # Token usage summed over every LLM call made for this message
+            usage = {'input_tokens': 0, 'output_tokens': 0, 'total_tokens': 0}
 
             # Tool execution loop - keep going until no more tool calls
             max_iterations = 10  # Prevent infinite loops
@@ -236,74 +566,91 @@ def chat():
             while iteration < max_iterations:
                 iteration += 1
 
-                # Collect the full response (we need complete tool_calls before executing)
-                full_response = None
+                # Collect content and tool call deltas; tool calls must be complete before executing
                 collected_content = []
+                tool_call_parts = {}
+                started_calls = {}
+
+                stream = with_keepalive(llm_with_tools.stream(messages), SSE_KEEPALIVE_SECONDS,
+                                        batcher.seconds_until_flush)
+                for chunk in stream:
+                    if chunk is None:
+                        # Still waiting on the provider: send buffered content that is due,
+                        # otherwise keep proxies from timing out the stream
+                        yield batcher.flush() or KEEPALIVE_FRAME
+                        continue
 
-                for chunk in llm_with_tools.stream(messages):
                     # Stream text content to the client
                     content = chunk.content
                     if content:
-                        if isinstance(content, list):
-                            content = ''.join(
-                                block.get('text', '') if isinstance(block, dict) else str(block)
-                                for block in content
-                            )
-                        elif not isinstance(content, str):
-                            content = str(content)
+                        if CONTENT_IS_BLOCKS:
+                            content = _flatten_content_blocks(content)
                         if content:
                             collected_content.append(content)
-                            yield f"data: {json.dumps({'content': content})}\n\n"
-
-                    # Accumulate the full response to get complete tool calls
-                    if full_response is None:
-                        full_response = chunk
-                    else:
-                        full_response = full_response + chunk
+                            frame = batcher.add(content)
+                            if frame:
+                                yield frame
+
+                    # Merge tool call deltas in place instead of adding up whole message chunks
+                    if chunk.tool_call_chunks:
+                        merge_tool_call_chunks(tool_call_parts, chunk.tool_call_chunks)
+                        # Run finished tool calls while the model is still generating the rest
+                        if len(tool_call_parts) > 1:
+                            start_completed_tool_calls(tool_map, tool_call_parts, started_calls)
+
+                    # Providers report usage on the final chunk, which LangChain normalizes into usage_metadata
+                    usage_metadata = chunk.usage_metadata
+                    if usage_metadata:
+                        for key in usage:
+                            usage[key] += usage_metadata.get(key, 0)
+
+                # Send whatever is still buffered before tool status or completion events
+                frame = batcher.flush()
+                if frame:
+                    yield frame
 
                 # Check if there are tool calls to execute
-                if not full_response or not hasattr(full_response, 'tool_calls') or not full_response.tool_calls:
+                tool_calls = None
+                if tool_call_parts:
+                    tool_calls = AIMessageChunk(content='', tool_call_chunks=list(tool_call_parts.values())).tool_calls
+                if not tool_calls:
+                    # Only answers that used no tools are reusable; tool output can change
+                    if cache_key is not None and iteration == 1:
+                        response_cache.set(cache_key, ''.join(collected_content))
                     break  # No tool calls, we're done
 
-                # Execute each tool call
-                tool_results = []
-                for tool_call in full_response.tool_calls:
-                    tool_name = tool_call.get('name') if isinstance(tool_call, dict) else getattr(tool_call, 'name', '')
-                    tool_args = tool_call.get('args', {}) if isinstance(tool_call, dict) else getattr(tool_call, 'args', {})
-                    tool_id = tool_call.get('id') if isinstance(tool_call, dict) else getattr(tool_call, 'id', '')
+                # Announce each tool call and start any not already running, so they all run concurrently
+                pending_calls = []
+                # LangChain parses tool calls into ToolCall dicts for every provider
+                for tool_call in tool_calls:
+                    tool_name = tool_call['name']
+                    tool_args = tool_call['args']
+                    tool_id = tool_call['id']
 
                     if not tool_name:
                         continue
 
-                    yield f"data: {json.dumps({'content': f' [Using tool: {tool_name}]'})}\n\n"
-
-                    # Execute the tool
-                    if tool_name in tool_map:
-                        try:
-                            tool_func = tool_map[tool_name]
-                            result = tool_func.invoke(tool_args)
-                            tool_results.append({
-                                'tool_call_id': tool_id,
-                                'name': tool_name,
-                                'content': str(result)
-                            })
-                        except Exception as e:
-                            tool_results.append({
-                                'tool_call_id': tool_id,
-                                'name': tool_name,
-                                'content': f"Error executing tool: {str(e)}"
-                            })
-                    else:
-                        tool_results.append({
-                            'tool_call_id': tool_id,
-                            'name': tool_name,
-                            'content': f"Tool '{tool_name}' not found"
-                        })
+                    yield content_event(f' [Using tool: {tool_name}]')
+                    future = started_calls.pop(tool_id, None) if tool_id else None
+                    if future is None:
+                        future = start_tool_call(tool_map, tool_name, tool_args)
+                    pending_calls.append((tool_name, tool_id, future))
+
+                # Keep the stream alive while slow tools run
+                if SSE_KEEPALIVE_SECONDS > 0:
+                    futures = [future for _, _, future in pending_calls]
+                    while wait(futures, timeout=SSE_KEEPALIVE_SECONDS).not_done:
+                        yield KEEPALIVE_FRAME
+
+                tool_results = [
+                    {'tool_call_id': tool_id, 'name': tool_name, 'content': future.result()}
+                    for tool_name, tool_id, future in pending_calls
+                ]
 
                 # Add the assistant's response and tool results to messages
                 messages.append(AIMessage(
                     content=''.join(collected_content),
-                    tool_calls=full_response.tool_calls
+                    tool_calls=tool_calls
                 ))
 
                 for result in tool_results:
@@ -312,17 +659,25 @@ def chat():
                         tool_call_id=result['tool_call_id']
                     ))
 
+            if usage['total_tokens']:
+                yield sse_event({'usage': usage})
+
             # Send completion signal
-            yield f"data: {json.dumps({'done': True})}\n\n"
+            yield DONE_FRAME
 
         except Exception as e:
-            yield f"data: {json.dumps({'error': str(e)})}\n\n"
+            frame = batcher.flush()
+            if frame:
+                yield frame
+            yield sse_event({'error': str(e)})
 
     return Response(
         stream_with_context(generate()),
         mimetype='text/event-stream',
         headers={
-            'Cache-Control': 'no-cache',
+            # Keep proxies from compressing or buffering the stream; Connection is
+            # hop-by-hop and left to the server
+            'Cache-Control': 'no-cache, no-transform',
             'X-Accel-Buffering': 'no'
         }
     )
@@ -1,99 +1,252 @@
 """Authentication middleware for Flask backend."""
 
+import hashlib
 import os
-from functools import wraps
-from flask import request, jsonify
-from google.oauth2 import id_token
-from google.auth.transport import requests as google_requests
+import re
+import threading
+import time
+from collections import OrderedDict
+from flask import Response, g, request
+import jwt
+import requests
+from jwt.algorithms import RSAAlgorithm
 
 GOOGLE_CLIENT_ID = os.getenv("GOOGLE_CLIENT_ID")
 
+GOOGLE_CERTS_URL = "https://www.googleapis.com/oauth2/v3/certs"
+GOOGLE_ISSUERS = ["accounts.google.com", "https://accounts.google.com"]
+
+# Google's signing keys, cached for as long as the certs endpoint's
+# Cache-Control max-age allows
+_jwks = {"keys": {}, "expires_at": 0.0, "fetched_at": 0.0}
+_jwks_lock = threading.Lock()
+# Pooled connection to Google, reused across key refreshes
+_http = requests.Session()
+_MAX_AGE_RE = re.compile(r"max-age=(\d+)")
+# Fallback lifetime when the certs response carries no max-age
+DEFAULT_JWKS_MAX_AGE = 300
+# Minimum seconds between refetches triggered by an unknown key id, so tokens
+# with made-up key ids can't make every request hit Google
+UNKNOWN_KID_REFRESH_INTERVAL = 60
+
+
+def _fetch_google_keys():
+    """Download Google's JWKS and replace the cached signing keys."""
+    response = _http.get(GOOGLE_CERTS_URL, timeout=5)
+    response.raise_for_status()
+
+    keys = {jwk["kid"]: RSAAlgorithm.from_jwk(jwk) for jwk in response.json()["keys"]}
+    match = _MAX_AGE_RE.search(response.headers.get("Cache-Control", ""))
+    max_age = int(match.group(1)) if match else DEFAULT_JWKS_MAX_AGE
+
+    now = time.time()
+    _jwks["keys"] = keys
+    _jwks["expires_at"] = now + max_age
+    _jwks["fetched_at"] = now
+
+
+def _get_signing_key(kid: str):
+    """Return Google's public key for a key id, refreshing the cached JWKS when needed."""
+    key = _jwks["keys"].get(kid)
+    if key is not None and time.time() < _jwks["expires_at"]:
+        return key
+
+    with _jwks_lock:
+        now = time.time()
+        key = _jwks["keys"].get(kid)
+        expired = now >= _jwks["expires_at"]
+        # Google rotates keys, so an unknown kid may be a new key we haven't fetched yet
+        if expired or (key is None and now - _jwks["fetched_at"] >= UNKNOWN_KID_REFRESH_INTERVAL):
+            _fetch_google_keys()
+            key = _jwks["keys"].get(kid)
+        return key
+
+
+# Verified tokens, keyed by a digest of the token so raw tokens aren't kept in
+# memory. Browsers resend the same token on every request until it expires.
+_token_cache = OrderedDict()
+_token_cache_lock = threading.Lock()
+TOKEN_CACHE_SIZE = 4096
+
+
+def _cached_user(token_digest: bytes) -> dict | None:
+    """Return the cached user info for a token digest if it hasn't expired."""
+    with _token_cache_lock:
+        entry = _token_cache.get(token_digest)
+        if entry is None:
+            return None
+        expires_at, user_info = entry
+        if expires_at <= time.time():
+            del _token_cache[token_digest]
+            return None
+        _token_cache.move_to_end(token_digest)
+        return user_info
+
+
+def _cache_user(token_digest: bytes, expires_at: float, user_info: dict):
+    """Remember a verified token until its exp claim, evicting the least recently used entries."""
+    with _token_cache_lock:
+        _token_cache[token_digest] = (expires_at, user_info)
+        _token_cache.move_to_end(token_digest)
+        while len(_token_cache) > TOKEN_CACHE_SIZE:
+            _token_cache.popitem(last=False)
+
+
+# Tokens that recently failed verification, so clients retrying a bad token
+# don't repeat the key lookup and signature check
+_rejected_tokens = OrderedDict()
+REJECTED_TOKEN_TTL = 60
+
+
+def _recently_rejected(token_digest: bytes) -> bool:
+    with _token_cache_lock:
+        expires_at = _rejected_tokens.get(token_digest)
+        if expires_at is None:
+            return False
+        if expires_at <= time.time():
+            del _rejected_tokens[token_digest]
+            return False
+        return True
+
+
+def _reject(token_digest: bytes):
+    with _token_cache_lock:
+        _rejected_tokens[token_digest] = time.time() + REJECTED_TOKEN_TTL
+        _rejected_tokens.move_to_end(token_digest)
+        while len(_rejected_tokens) > TOKEN_CACHE_SIZE:
+            _rejected_tokens.popitem(last=False)
+
 
 def verify_google_token(token: str) -> dict | None:
     """
     Verify a Google ID token and return the user info.
 
+    The signature is checked locally against Google's cached public keys, so
+    verification doesn't need a network round-trip per request. Tokens that
+    verified before are served from a cache until they expire, and tokens that
+    are malformed or recently failed are rejected without being checked again.
+
     Args:
         token: The Google ID token to verify
 
     Returns:
         User info dict if valid, None otherwise
     """
+    # A JWT is exactly three dot-separated segments
+    if token.count(".") != 2:
+        return None
+
+    token_digest = hashlib.blake2b(token.encode(), digest_size=16).digest()
+    user_info = _cached_user(token_digest)
+    if user_info is not None:
+        return user_info
+    if _recently_rejected(token_digest):
+        return None
+
     try:
-        idinfo = id_token.verify_oauth2_token(
-            token,
-            google_requests.Request(),
-            GOOGLE_CLIENT_ID
-        )
+        header = jwt.get_unverified_header(token)
+        kid = header.get("kid")
+        if header.get("alg") != "RS256" or not kid:
+            _reject(token_digest)
+            return None
 
-        # Verify the issuer
-        if idinfo["iss"] not in ["accounts.google.com", "https://accounts.google.com"]:
+        key = _get_signing_key(kid)
+        if key is None:
+            print(f"Token verification failed: unknown key id {kid}")
+            _reject(token_digest)
             return None
 
-        return {
+        idinfo = jwt.decode(
+            token,
+            key,
+            algorithms=["RS256"],
+            audience=GOOGLE_CLIENT_ID,
+            issuer=GOOGLE_ISSUERS,
+            options={"require": ["exp", "iat", "iss", "sub"], "verify_aud": GOOGLE_CLIENT_ID is not None}
+        )
+
+        user_info = {
             "sub": idinfo["sub"],  # Google user ID
             "email": idinfo.get("email"),
             "name": idinfo.get("name"),
             "picture": idinfo.get("picture"),
         }
+        _cache_user(token_digest, idinfo["exp"], user_info)
+        return user_info
+    except jwt.PyJWTError as e:
+        print(f"Token verification failed: {e}")
+        _reject(token_digest)
+        return None
     except Exception as e:
+        # Not cached as a rejection: fetching Google's keys may just have failed transiently
         print(f"Token verification failed: {e}")
         return None
 
 
+# Error bodies are encoded once; a new Response is built per failure because
+# after_request hooks (CORS) add headers to it
+_MISSING_HEADER_BODY = b'{"error":"Missing Authorization header"}'
+_INVALID_FORMAT_BODY = b'{"error":"Invalid Authorization header format"}'
+_INVALID_TOKEN_BODY = b'{"error":"Invalid or expired token"}'
+
+AUTH_REQUIRED = "required"
+AUTH_OPTIONAL = "optional"
+
+
+def _unauthorized(body: bytes) -> Response:
+    return Response(body, status=401, mimetype="application/json")
+
+
 def require_auth(f):
     """
-    Decorator to require authentication for a route.
+    Mark a route as requiring authentication.
 
     Expects the Authorization header to contain:
     - Bearer <google_id_token>
 
-    Sets request.user with the verified user info.
+    The check itself runs once per request in the hook registered by
+    init_auth, which sets g.user with the verified user info.
     """
-    @wraps(f)
-    def decorated_function(*args, **kwargs):
-        auth_header = request.headers.get("Authorization")
-
-        if not auth_header:
-            return jsonify({"error": "Missing Authorization header"}), 401
+    f.auth_mode = AUTH_REQUIRED
+    return f
 
-        parts = auth_header.split()
-        if len(parts) != 2 or parts[0].lower() != "bearer":
-            return jsonify({"error": "Invalid Authorization header format"}), 401
-
-        token = parts[1]
-
-        # Verify the Google ID token
-        user_info = verify_google_token(token)
 
-        if not user_info:
-            return jsonify({"error": "Invalid or expired token"}), 401
+def optional_auth(f):
+    """
+    Mark a route as attempting authentication without requiring it.
 
-        # Attach user info to request
-        request.user = user_info
+    g.user is set to the user info if authentication succeeds, None otherwise.
+    """
+    f.auth_mode = AUTH_OPTIONAL
+    return f
 
-        return f(*args, **kwargs)
 
-    return decorated_function
+def init_auth(app):
+    """Register the before_request hook that authenticates routes marked with require_auth or optional_auth."""
 
+    @app.before_request
+    def authenticate():
+        # CORS preflight requests never carry credentials
+        if request.method == "OPTIONS":
+            return None
 
-def optional_auth(f):
-    """
-    Decorator that attempts to authenticate but doesn't require it.
+        view = app.view_functions.get(request.endpoint)
+        auth_mode = getattr(view, "auth_mode", None)
+        if auth_mode is None:
+            return None
 
-    Sets request.user if authentication succeeds, None otherwise.
-    """
-    @wraps(f)
-    def decorated_function(*args, **kwargs):
+        g.user = None
         auth_header = request.headers.get("Authorization")
-        request.user = None
+        if not auth_header:
+            return _unauthorized(_MISSING_HEADER_BODY) if auth_mode == AUTH_REQUIRED else None
 
-        if auth_header:
-            parts = auth_header.split()
-            if len(parts) == 2 and parts[0].lower() == "bearer":
-                token = parts[1]
-                request.user = verify_google_token(token)
+        scheme, _, token = auth_header.partition(" ")
+        if scheme.lower() != "bearer" or not token or " " in token:
+            return _unauthorized(_INVALID_FORMAT_BODY) if auth_mode == AUTH_REQUIRED else None
 
-        return f(*args, **kwargs)
+        # Verify the Google ID token
+        g.user = verify_google_token(token)
 
-    return decorated_function
+        if g.user is None and auth_mode == AUTH_REQUIRED:
+            return _unauthorized(_INVALID_TOKEN_BODY)
+        return None
@@ -1,4 +1,6 @@
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from datetime import datetime
 
 db = SQLAlchemy()
@@ -6,6 +8,10 @@ db = SQLAlchemy()
 class Tool(db.Model):
     """Model for storing tool definitions and custom context."""
     __tablename__ = 'tools'
+    __table_args__ = (
+        # MCP syncs and server deletion filter on source and server name
+        db.Index('ix_tools_source_mcp', 'source', 'mcp_server_name'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(100), unique=True, nullable=False)
@@ -35,45 +41,95 @@ class Tool(db.Model):
             'updated_at': self.updated_at.isoformat() if self.updated_at else None
         }
 
+    @classmethod
+    def list_dicts_query(cls):
+        """Select every tool column as plain rows, without building ORM instances."""
+        return db.select(*cls.__table__.columns)
+
+    @classmethod
+    def list_dicts(cls):
+        """Return all tools as dictionaries; datetimes are left for the JSON encoder."""
+        return [dict(row) for row in db.session.execute(cls.list_dicts_query()).mappings()]
+
+    @property
+    def mcp_key(self):
+        """(server name, tool name as the server knows it) for an MCP tool, without the server prefix."""
+        return (self.mcp_server_name, self.name.removeprefix(f"{self.mcp_server_name}_"))
+
     def get_context(self):
         """Get the effective context (custom if set, otherwise default)."""
         return self.custom_context if self.custom_context else self.default_context
 
+class SyncTask(db.Model):
+    """Status of a background MCP tool sync, readable from every worker."""
+    __tablename__ = 'sync_tasks'
+
+    task_id = db.Column(db.String(32), primary_key=True)
+    status = db.Column(db.String(20), nullable=False, default='queued')  # 'queued', 'running', 'completed' or 'failed'
+    tools_added = db.Column(db.Integer, nullable=True)
+    tools_removed = db.Column(db.Integer, nullable=True)
+    warnings = db.Column(db.JSON, nullable=True)  # Per-server errors from a completed sync
+    error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def to_dict(self):
+        """Convert the task to its status response, leaving out fields that don't apply."""
+        task = {'task_id': self.task_id, 'status': self.status}
+        if self.status == 'completed':
+            task['tools_added'] = self.tools_added
+            task['tools_removed'] = self.tools_removed
+            if self.warnings:
+                task['warnings'] = self.warnings
+        elif self.status == 'failed':
+            task['error'] = self.error
+        return task
+
+# Built-in tools created on first start
+DEFAULT_TOOLS = (
+    {
+        'name': 'web_search',
+        'description': 'Search the web for current information',
+        'default_context': 'You are searching the web to find current information. Provide accurate, up-to-date results based on the search query.'
+    },
+    {
+        'name': 'calculator',
+        'description': 'Perform mathematical calculations',
+        'default_context': 'You are performing mathematical calculations. Calculate the expression accurately and show your work.'
+    },
+    {
+        'name': 'code_executor',
+        'description': 'Execute Python code safely',
+        'default_context': 'You are executing Python code. Ensure the code is safe and provide the output of the execution.'
+    },
+    {
+        'name': 'file_analyzer',
+        'description': 'Analyze and summarize file contents',
+        'default_context': 'You are analyzing a file. Provide a comprehensive summary and key insights from the content.'
+    },
+)
+
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    """Configure each new SQLite connection for concurrent readers and a single writer."""
+    cursor = dbapi_connection.cursor()
+    cursor.execute('PRAGMA journal_mode=WAL')
+    cursor.execute('PRAGMA synchronous=NORMAL')
+    cursor.execute('PRAGMA temp_store=MEMORY')
+    cursor.execute('PRAGMA mmap_size=268435456')
+    cursor.close()
+
 def init_db(app):
     """Initialize database and create default tools."""
     db.init_app(app)
 
     with app.app_context():
-        db.create_all()
+        if db.engine.dialect.name == 'sqlite':
+            event.listen(db.engine, 'connect', _set_sqlite_pragmas)
 
-        # Create default tools if they don't exist
-        default_tools = [
-            {
-                'name': 'web_search',
-                'description': 'Search the web for current information',
-                'default_context': 'You are searching the web to find current information. Provide accurate, up-to-date results based on the search query.'
-            },
-            {
-                'name': 'calculator',
-                'description': 'Perform mathematical calculations',
-                'default_context': 'You are performing mathematical calculations. Calculate the expression accurately and show your work.'
-            },
-            {
-                'name': 'code_executor',
-                'description': 'Execute Python code safely',
-                'default_context': 'You are executing Python code. Ensure the code is safe and provide the output of the execution.'
-            },
-            {
-                'name': 'file_analyzer',
-                'description': 'Analyze and summarize file contents',
-                'default_context': 'You are analyzing a file. Provide a comprehensive summary and key insights from the content.'
-            }
-        ]
-
-        for tool_data in default_tools:
-            existing_tool = Tool.query.filter_by(name=tool_data['name']).first()
-            if not existing_tool:
-                tool = Tool(**tool_data)
-                db.session.add(tool)
+        db.create_all()
+        # create_all skips tables that already exist, so add indexes missing from older databases
+        for index in Tool.__table__.indexes:
+            index.create(db.engine, checkfirst=True)
 
+        # Create default tools if they don't exist, in one statement
+        db.session.execute(sqlite_insert(Tool).on_conflict_do_nothing(index_elements=['name']), list(DEFAULT_TOOLS))
         db.session.commit()
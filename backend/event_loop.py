@@ -0,0 +1,55 @@
+"""Long-lived asyncio event loop for running MCP coroutines from sync code."""
+import asyncio
+import concurrent.futures
+import sys
+import threading
+
+_loop = None
+_loop_lock = threading.Lock()
+
+
+def _new_loop() -> asyncio.AbstractEventLoop:
+    """Create the background loop, using uvloop when it is installed and usable."""
+    # Under gevent the loop thread is a greenlet, and uvloop's libuv polling would
+    # block every other greenlet; the standard loop's patched selectors yield instead
+    gevent_monkey = sys.modules.get('gevent.monkey')
+    if gevent_monkey is None or not gevent_monkey.is_module_patched('threading'):
+        try:
+            import uvloop
+            return uvloop.new_event_loop()
+        except ImportError:
+            pass
+    return asyncio.new_event_loop()
+
+
+def get_loop() -> asyncio.AbstractEventLoop:
+    """Return the background event loop, starting its thread on first use.
+
+    The loop is started lazily so that forked server workers each get their own.
+    """
+    global _loop
+    if _loop is None:
+        with _loop_lock:
+            if _loop is None:
+                loop = _new_loop()
+                threading.Thread(target=loop.run_forever, name='mcp-event-loop', daemon=True).start()
+                _loop = loop
+    return _loop
+
+
+def submit(coro) -> concurrent.futures.Future:
+    """Schedule a coroutine on the background loop without waiting for it."""
+    return asyncio.run_coroutine_threadsafe(coro, get_loop())
+
+
+def run_sync(coro, timeout: float = None):
+    """Run a coroutine on the background loop and block until it returns.
+
+    Args:
+        coro: Coroutine to run
+        timeout: Optional number of seconds to wait for the result
+
+    Returns:
+        The coroutine's result; exceptions it raises are re-raised here
+    """
+    return submit(coro).result(timeout)
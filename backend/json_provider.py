@@ -0,0 +1,20 @@
+"""Flask JSON provider backed by orjson."""
+from flask.json.provider import DefaultJSONProvider
+import orjson
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """Parse request bodies and serialize jsonify() responses with orjson.
+
+    Types orjson does not handle natively fall back to Flask's default
+    conversions (dates, decimals, UUIDs, dataclasses, ``__html__``).
+    """
+
+    def dumps(self, obj, **kwargs) -> str:
+        option = orjson.OPT_NON_STR_KEYS
+        if kwargs.pop('sort_keys', self.sort_keys):
+            option |= orjson.OPT_SORT_KEYS
+        return orjson.dumps(obj, default=self.default, option=option).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
@@ -1,33 +1,231 @@
-import json
-import os
 import asyncio
-from typing import Dict, List, Optional, Tuple
-from mcp import ClientSession, StdioServerParameters
-from mcp.client.stdio import stdio_client
-from mcp.client.streamable_http import streamablehttp_client
+import atexit
+import logging
+import os
+import threading
+import time
+import httpx
+import orjson
+from typing import TYPE_CHECKING, Dict, List, Optional, Tuple
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from database import db, Tool
+from event_loop import run_sync, submit
+
+logger = logging.getLogger(__name__)
+
+# The MCP SDK is imported where sessions are opened, since importing it pulls
+# in the server modules and their dependencies; apps without MCP servers never pay for it
+if TYPE_CHECKING:
+    from mcp import ClientSession
+
+# Maximum number of MCP servers contacted at once during discovery
+MAX_CONCURRENT_DISCOVERIES = 16
+
+# Seconds to wait for an MCP session to shut down
+SESSION_CLOSE_TIMEOUT = 5
+# Seconds to wait for a ping when checking whether a failed session is still connected
+SESSION_PING_TIMEOUT = 5
+# Seconds a server's discovered tools are reused before it is asked again
+DISCOVERY_CACHE_TTL = 60
+# Seconds to wait after a config change before writing the file, so bursts of
+# edits are saved together
+CONFIG_SAVE_DELAY = 0.25
+
+def _http_client(headers: Optional[dict] = None, timeout: Optional[httpx.Timeout] = None,
+                 auth: Optional[httpx.Auth] = None) -> httpx.AsyncClient:
+    """Build the HTTP client for a streamable HTTP session.
+
+    The client lives as long as the session, so its pooled connections are
+    reused by every discovery and tool call. HTTP/2 lets requests and the
+    server's event stream share one connection.
+    """
+    return httpx.AsyncClient(
+        http2=True,
+        follow_redirects=True,
+        headers=headers,
+        timeout=timeout or httpx.Timeout(30.0),
+        auth=auth,
+        limits=httpx.Limits(max_keepalive_connections=32),
+    )
+
+def _tool_to_dict(server_name: str, tool) -> dict:
+    """Describe a discovered MCP tool, with its input schema serialized as JSON text."""
+    input_schema = getattr(tool, 'inputSchema', None)
+    return {
+        'name': tool.name,
+        'description': tool.description or 'No description provided',
+        'server_name': server_name,
+        'schema': orjson.dumps(input_schema).decode() if input_schema is not None else None
+    }
+
+class MCPSession:
+    """A long-lived connection to one MCP server.
+
+    anyio requires the transport and ClientSession contexts to be entered and
+    exited by the same task, so a dedicated task owns them for the lifetime of
+    the session and callers share the initialized ClientSession. All methods
+    must run on the background event loop.
+    """
+
+    def __init__(self, server_name: str, server_config: dict):
+        self.server_name = server_name
+        self.server_config = server_config
+        self._ready = None
+        self._closing = None
+        self._task = None
+
+    @property
+    def alive(self) -> bool:
+        """Whether the owning task is still running (connecting or connected)."""
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        """Start connecting in a background task."""
+        self._ready = asyncio.get_running_loop().create_future()
+        self._closing = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+
+    async def session(self) -> 'ClientSession':
+        """Wait for the connection and return the initialized ClientSession."""
+        # Shield so a cancelled caller doesn't cancel the shared future
+        return await asyncio.shield(self._ready)
+
+    async def aclose(self):
+        """Close the session and wait for the owning task to finish."""
+        if self._task is None:
+            return
+        self._closing.set()
+        try:
+            await asyncio.wait_for(self._task, SESSION_CLOSE_TIMEOUT)
+        except (asyncio.TimeoutError, asyncio.CancelledError, Exception):
+            pass
+
+    def _connect(self):
+        transport = self.server_config.get('transport', 'stdio')
+        if transport == 'stdio':
+            from mcp import StdioServerParameters
+            from mcp.client.stdio import stdio_client
+
+            server_params = StdioServerParameters(
+                command=self.server_config['command'],
+                args=self.server_config.get('args', []),
+                env=self.server_config.get('env', {})
+            )
+            return stdio_client(server_params)
+        elif transport == 'http':
+            from mcp.client.streamable_http import streamablehttp_client
+
+            headers = self.server_config.get('headers', {}).copy()
+            # Ensure required Accept header is present for MCP protocol
+            headers.setdefault('Accept', 'application/json, text/event-stream')
+            return streamablehttp_client(self.server_config['url'], headers=headers, httpx_client_factory=_http_client)
+        raise ValueError(f"Unknown transport type: {transport}")
+
+    async def _run(self):
+        from mcp import ClientSession
+
+        try:
+            async with self._connect() as streams:
+                read, write = streams[0], streams[1]
+                async with ClientSession(read, write) as session:
+                    await session.initialize()
+                    self._ready.set_result(session)
+                    await self._closing.wait()
+        except ExceptionGroup as eg:
+            # Extract the underlying exceptions from TaskGroup failures
+            errors = [str(e) for e in eg.exceptions]
+            self._fail(ConnectionError(f"Failed to connect to MCP server {self.server_name}: {'; '.join(errors)}"))
+        except Exception as e:
+            self._fail(e)
+        finally:
+            self._fail(ConnectionError(f"MCP session to {self.server_name} closed"))
+
+    def _fail(self, error: Exception):
+        if self._ready.done():
+            return
+        self._ready.set_exception(error)
+        # Mark the exception as retrieved; callers that await the session still see it
+        self._ready.exception()
 
 class MCPManager:
     """Manager for MCP server connections and tool discovery."""
 
-    def __init__(self, config_path='mcp_servers.json'):
+    def __init__(self, config_path='mcp_servers.json', discovery_ttl: float = DISCOVERY_CACHE_TTL):
         self.config_path = config_path
-        self.servers = {}
+        self.discovery_ttl = discovery_ttl
+        self._servers = {}
+        # Modification time of the config file when it was last read or written
+        self._config_mtime = None
+        # Open sessions by server name; only touched from the background event loop
+        self._sessions: Dict[str, MCPSession] = {}
+        # Discovered tools by server name, as (discovered_at, server_config, tools)
+        self._tool_cache: Dict[str, Tuple[float, dict, List[dict]]] = {}
+        # Whether in-memory servers have changes not yet written to the config file
+        self._dirty = False
+        self._flush_timer: Optional[threading.Timer] = None
+        self._flush_lock = threading.Lock()
         self.load_config()
+        atexit.register(self.close_sessions)
+        atexit.register(self.flush)
+
+    @property
+    def servers(self) -> dict:
+        """Configured MCP servers, re-read if the config file changed on disk."""
+        self.load_config()
+        return self._servers
 
     def load_config(self):
-        """Load MCP server configuration from JSON file."""
-        if os.path.exists(self.config_path):
-            with open(self.config_path, 'r') as f:
-                config = json.load(f)
-                self.servers = config.get('mcpServers', {})
-        else:
-            self.servers = {}
+        """Load MCP server configuration from JSON file if it changed since the last load."""
+        if self._dirty:
+            # Unsaved local changes win until they are flushed
+            return
+
+        try:
+            mtime = os.stat(self.config_path).st_mtime_ns
+        except FileNotFoundError:
+            self._servers = {}
+            self._config_mtime = None
+            return
+
+        if mtime == self._config_mtime:
+            return
+
+        with open(self.config_path, 'rb') as f:
+            config = orjson.loads(f.read())
+        self._servers = config.get('mcpServers', {})
+        self._config_mtime = mtime
 
     def save_config(self):
-        """Save MCP server configuration to JSON file."""
-        with open(self.config_path, 'w') as f:
-            json.dump({'mcpServers': self.servers}, f, indent=2)
+        """Save MCP server configuration to JSON file.
+
+        The file is written to a temporary path and renamed over the original,
+        so readers never see a partially written config.
+        """
+        tmp_path = f"{self.config_path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            f.write(orjson.dumps({'mcpServers': self._servers}, option=orjson.OPT_INDENT_2))
+        os.replace(tmp_path, self.config_path)
+        self._config_mtime = os.stat(self.config_path).st_mtime_ns
+
+    def flush(self):
+        """Write pending configuration changes to the config file now."""
+        with self._flush_lock:
+            if self._flush_timer is not None:
+                self._flush_timer.cancel()
+                self._flush_timer = None
+            if not self._dirty:
+                return
+            self.save_config()
+            self._dirty = False
+
+    def _mark_dirty(self):
+        """Record a configuration change and schedule a write for shortly after."""
+        with self._flush_lock:
+            self._dirty = True
+            if self._flush_timer is None:
+                self._flush_timer = threading.Timer(CONFIG_SAVE_DELAY, self.flush)
+                self._flush_timer.daemon = True
+                self._flush_timer.start()
 
     def add_server(self, name: str, transport: str, command: str = None, args: List[str] = None,
                    env: Dict[str, str] = None, url: str = None, headers: Dict[str, str] = None):
@@ -63,117 +261,103 @@ class MCPManager:
             raise ValueError(f"Unsupported transport: {transport}. Use 'stdio' or 'http'")
 
         self.servers[name] = server_config
-        self.save_config()
+        self._mark_dirty()
+        self.invalidate(name)
 
     def remove_server(self, name: str):
         """Remove an MCP server from configuration."""
         if name in self.servers:
             del self.servers[name]
-            self.save_config()
+            self._mark_dirty()
+            self.invalidate(name)
+            if name in self._sessions:
+                submit(self._close_session(name))
             return True
         return False
 
-    async def discover_tools_from_server(self, server_name: str, server_config: dict) -> List[dict]:
-        """Connect to an MCP server and discover its tools.
+    def invalidate(self, server_name: str = None):
+        """Forget cached discovery results for a server, or for all servers if None."""
+        if server_name is None:
+            self._tool_cache.clear()
+        else:
+            self._tool_cache.pop(server_name, None)
+
+    async def discover_tools_from_server(self, server_name: str, server_config: dict,
+                                         force_refresh: bool = False) -> List[dict]:
+        """Discover an MCP server's tools over its persistent session.
 
+        Results are reused for ``discovery_ttl`` seconds unless ``force_refresh``
+        is set or the server's config changed since they were discovered.
         Raises exceptions on failure so callers can handle errors appropriately.
         """
         transport = server_config.get('transport', 'stdio')
-
-        if transport == 'stdio':
-            return await self._discover_tools_stdio(server_name, server_config)
-        elif transport == 'http':
-            return await self._discover_tools_http(server_name, server_config)
-        else:
+        if transport not in ('stdio', 'http'):
             raise ValueError(f"Unknown transport type: {transport}")
 
-    async def _discover_tools_stdio(self, server_name: str, server_config: dict) -> List[dict]:
-        """Discover tools from a stdio-based MCP server."""
-        server_params = StdioServerParameters(
-            command=server_config['command'],
-            args=server_config.get('args', []),
-            env=server_config.get('env', {})
-        )
+        cached = self._tool_cache.get(server_name)
+        if (not force_refresh and cached is not None and cached[1] == server_config
+                and time.monotonic() - cached[0] < self.discovery_ttl):
+            return cached[2]
 
-        try:
-            async with stdio_client(server_params) as (read, write):
-                async with ClientSession(read, write) as session:
-                    await session.initialize()
+        # Listing tools is idempotent, so it is always safe to retry on a fresh connection
+        tools_result = await self._with_session(server_name, lambda session: session.list_tools(), retry=True)
 
-                    # List available tools
-                    tools_result = await session.list_tools()
+        discovered_tools = [_tool_to_dict(server_name, tool) for tool in tools_result.tools]
 
-                    discovered_tools = []
-                    for tool in tools_result.tools:
-                        discovered_tools.append({
-                            'name': tool.name,
-                            'description': tool.description or 'No description provided',
-                            'server_name': server_name,
-                            'schema': json.dumps(tool.inputSchema) if hasattr(tool, 'inputSchema') else None
-                        })
-
-                    return discovered_tools
-        except ExceptionGroup as eg:
-            # Extract the underlying exceptions from TaskGroup failures
-            errors = [str(e) for e in eg.exceptions]
-            raise ConnectionError(f"Failed to connect to stdio server: {'; '.join(errors)}")
+        self._tool_cache[server_name] = (time.monotonic(), server_config, discovered_tools)
+        return discovered_tools
 
-    async def _discover_tools_http(self, server_name: str, server_config: dict) -> List[dict]:
-        """Discover tools from a remote HTTP MCP server using streamable HTTP transport."""
-        url = server_config['url']
-        headers = server_config.get('headers', {}).copy()
-        # Ensure required Accept header is present for MCP protocol
-        headers.setdefault('Accept', 'application/json, text/event-stream')
+    async def discover_all_tools(self, server_name: str = None,
+                                 force_refresh: bool = False) -> Tuple[List[dict], List[str]]:
+        """Discover tools from all configured MCP servers concurrently.
 
-        try:
-            async with streamablehttp_client(url, headers=headers) as (read, write, _):
-                async with ClientSession(read, write) as session:
-                    await session.initialize()
-
-                    # List available tools
-                    tools_result = await session.list_tools()
-
-                    discovered_tools = []
-                    for tool in tools_result.tools:
-                        discovered_tools.append({
-                            'name': tool.name,
-                            'description': tool.description or 'No description provided',
-                            'server_name': server_name,
-                            'schema': json.dumps(tool.inputSchema) if hasattr(tool, 'inputSchema') else None
-                        })
-
-                    return discovered_tools
-        except ExceptionGroup as eg:
-            # Extract the underlying exceptions from TaskGroup failures
-            errors = [str(e) for e in eg.exceptions]
-            raise ConnectionError(f"Failed to connect to HTTP server at {url}: {'; '.join(errors)}")
-
-    async def discover_all_tools(self) -> Tuple[List[dict], List[str]]:
-        """Discover tools from all configured MCP servers.
+        Args:
+            server_name: Optional specific server to discover. If None, discovers all servers.
+            force_refresh: Ask every server again instead of using cached results
 
         Returns:
             Tuple of (discovered_tools, errors) where errors is a list of error messages
         """
+        # Bound the fan-out so many configured servers don't all connect at once
+        semaphore = asyncio.Semaphore(MAX_CONCURRENT_DISCOVERIES)
+
+        async def discover(server_name, server_config):
+            async with semaphore:
+                return await self.discover_tools_from_server(server_name, server_config, force_refresh)
+
+        if server_name:
+            if server_name not in self.servers:
+                return [], [f"MCP server '{server_name}' not found"]
+            servers = [(server_name, self.servers[server_name])]
+        else:
+            servers = list(self.servers.items())
+            if not servers:
+                return [], []
+        results = await asyncio.gather(
+            *(discover(server_name, server_config) for server_name, server_config in servers),
+            return_exceptions=True
+        )
+
         all_tools = []
         errors = []
 
-        for server_name, server_config in self.servers.items():
-            try:
-                tools = await self.discover_tools_from_server(server_name, server_config)
-                all_tools.extend(tools)
-            except Exception as e:
-                error_msg = f"Failed to discover tools from {server_name}: {str(e)}"
-                print(error_msg)
+        for (server_name, _), result in zip(servers, results):
+            if isinstance(result, BaseException):
+                error_msg = f"Failed to discover tools from {server_name}: {str(result)}"
+                logger.warning("%s", error_msg)
                 errors.append(error_msg)
+            else:
+                all_tools.extend(result)
 
         return all_tools, errors
 
-    def sync_tools_to_database(self, app, server_name: str = None) -> dict:
+    def sync_tools_to_database(self, app, server_name: str = None, force_refresh: bool = False) -> dict:
         """Synchronize discovered MCP tools to database.
 
         Args:
             app: Flask application instance
             server_name: Optional specific server to sync. If None, syncs all servers.
+            force_refresh: Rediscover tools even if cached results are still fresh
 
         Returns:
             Dictionary with 'tools_added', 'tools_removed', and 'errors' keys
@@ -183,49 +367,62 @@ class MCPManager:
         with app.app_context():
             # Discover tools synchronously
             try:
-                loop = asyncio.new_event_loop()
-                asyncio.set_event_loop(loop)
-                try:
-                    discovered_tools, errors = loop.run_until_complete(self.discover_all_tools())
+                if not server_name and not self.servers:
+                    # Nothing to contact; still fall through to remove tools of deleted servers
+                    discovered_tools = []
+                else:
+                    # Only contact the requested server rather than discovering all and filtering
+                    discovered_tools, errors = run_sync(self.discover_all_tools(server_name, force_refresh))
                     result['errors'].extend(errors)
-                finally:
-                    loop.close()
             except Exception as e:
                 result['errors'].append(f"Failed to run tool discovery: {str(e)}")
                 return result
 
-            # Filter to specific server if requested
-            if server_name:
-                discovered_tools = [t for t in discovered_tools if t['server_name'] == server_name]
-
-            # Get existing MCP tools from database
-            existing_mcp_tools = Tool.query.filter_by(source='mcp').all()
-            existing_tool_keys = {f"{tool.mcp_server_name}:{tool.name.replace(f'{tool.mcp_server_name}_', '')}" for tool in existing_mcp_tools}
-
-            # Add new MCP tools to database
+            # One pass over the existing MCP tools collects both their keys and the
+            # tools of servers that no longer exist
+            current_server_names = self.servers.keys()
+            existing_tool_keys = set()
+            stale_ids = []
+            for tool in Tool.query.filter_by(source='mcp'):
+                if tool.mcp_server_name not in current_server_names:
+                    stale_ids.append(tool.id)
+                    continue
+                existing_tool_keys.add(tool.mcp_key)
+
+            # Add new MCP tools to database in one multi-row insert. Discovered tools
+            # are walked in order so new ids, and with them the tool order in the
+            # system prompt, are deterministic.
+            new_tools = []
             for tool_data in discovered_tools:
-                tool_key = f"{tool_data['server_name']}:{tool_data['name']}"
-
-                if tool_key not in existing_tool_keys:
-                    # Create new tool entry
-                    new_tool = Tool(
-                        name=f"{tool_data['server_name']}_{tool_data['name']}",
-                        description=tool_data['description'],
-                        default_context=f"You are using the {tool_data['name']} tool from {tool_data['server_name']} MCP server.",
-                        source='mcp',
-                        mcp_server_name=tool_data['server_name'],
-                        tool_schema=tool_data.get('schema'),
-                        enabled=True
-                    )
-                    db.session.add(new_tool)
-                    result['tools_added'] += 1
+                tool_key = (tool_data['server_name'], tool_data['name'])
+                if tool_key in existing_tool_keys:
+                    continue
+                existing_tool_keys.add(tool_key)
+                new_tools.append({
+                    'name': f"{tool_data['server_name']}_{tool_data['name']}",
+                    'description': tool_data['description'],
+                    'default_context': f"You are using the {tool_data['name']} tool from {tool_data['server_name']} MCP server.",
+                    'source': 'mcp',
+                    'mcp_server_name': tool_data['server_name'],
+                    'tool_schema': tool_data.get('schema'),
+                    'enabled': True
+                })
+
+            if new_tools:
+                # Skip rows whose name is already taken instead of failing the whole sync
+                stmt = sqlite_insert(Tool).on_conflict_do_nothing(index_elements=['name']).returning(Tool.name)
+                inserted = set(db.session.scalars(stmt, new_tools))
+                result['tools_added'] += len(inserted)
+                for tool_row in new_tools:
+                    if tool_row['name'] not in inserted:
+                        result['errors'].append(
+                            f"Skipped MCP tool '{tool_row['name']}': a tool with that name already exists"
+                        )
 
             # Remove tools from servers that no longer exist
-            current_server_names = set(self.servers.keys())
-            for tool in existing_mcp_tools:
-                if tool.mcp_server_name not in current_server_names:
-                    db.session.delete(tool)
-                    result['tools_removed'] += 1
+            if stale_ids:
+                Tool.query.filter(Tool.id.in_(stale_ids)).delete(synchronize_session=False)
+                result['tools_removed'] += len(stale_ids)
 
             db.session.commit()
 
@@ -234,67 +431,87 @@ class MCPManager:
     async def call_mcp_tool(self, server_name: str, tool_name: str, arguments: dict) -> str:
         """Call a tool on an MCP server."""
         if server_name not in self.servers:
+            await self._close_session(server_name)
             return f"Error: MCP server '{server_name}' not found"
 
-        server_config = self.servers[server_name]
-        transport = server_config.get('transport', 'stdio')
+        transport = self.servers[server_name].get('transport', 'stdio')
+        if transport not in ('stdio', 'http'):
+            return f"Error: Unknown transport type '{transport}'"
 
         try:
-            if transport == 'stdio':
-                return await self._call_tool_stdio(server_config, tool_name, arguments)
-            elif transport == 'http':
-                return await self._call_tool_http(server_config, tool_name, arguments)
-            else:
-                return f"Error: Unknown transport type '{transport}'"
-        except Exception as e:
-            return f"Error calling tool {tool_name}: {str(e)}"
-
-    async def _call_tool_stdio(self, server_config: dict, tool_name: str, arguments: dict) -> str:
-        """Call a tool on a stdio-based MCP server."""
-        server_params = StdioServerParameters(
-            command=server_config['command'],
-            args=server_config.get('args', []),
-            env=server_config.get('env', {})
-        )
-
-        async with stdio_client(server_params) as (read, write):
-            async with ClientSession(read, write) as session:
-                await session.initialize()
-
-                # Call the tool
-                result = await session.call_tool(tool_name, arguments)
-
-                # Extract text content from result
-                if hasattr(result, 'content') and result.content:
-                    return '\n'.join([
-                        item.text if hasattr(item, 'text') else str(item)
-                        for item in result.content
-                    ])
-
-                return str(result)
+            result = await self._with_session(server_name, lambda session: session.call_tool(tool_name, arguments))
 
-    async def _call_tool_http(self, server_config: dict, tool_name: str, arguments: dict) -> str:
-        """Call a tool on a remote HTTP MCP server using streamable HTTP transport."""
-        url = server_config['url']
-        headers = server_config.get('headers', {}).copy()
-        # Ensure required Accept header is present for MCP protocol
-        headers.setdefault('Accept', 'application/json, text/event-stream')
+            # Extract text content from result
+            if hasattr(result, 'content') and result.content:
+                return '\n'.join(
+                    item.text if hasattr(item, 'text') else str(item)
+                    for item in result.content
+                )
 
-        async with streamablehttp_client(url, headers=headers) as (read, write, _):
-            async with ClientSession(read, write) as session:
-                await session.initialize()
-
-                # Call the tool
-                result = await session.call_tool(tool_name, arguments)
-
-                # Extract text content from result
-                if hasattr(result, 'content') and result.content:
-                    return '\n'.join([
-                        item.text if hasattr(item, 'text') else str(item)
-                        for item in result.content
-                    ])
+            return str(result)
+        except Exception as e:
+            return f"Error calling tool {tool_name}: {str(e)}"
 
-                return str(result)
+    async def _get_session(self, server_name: str) -> 'ClientSession':
+        """Return the open session for a server, connecting if there is none or its config changed."""
+        server_config = self.servers[server_name]
+        mcp_session = self._sessions.get(server_name)
+
+        if mcp_session is None or not mcp_session.alive or mcp_session.server_config != server_config:
+            stale = mcp_session
+            # Register the replacement before awaiting the old session's close so
+            # concurrent callers share it instead of each opening their own.
+            mcp_session = MCPSession(server_name, server_config)
+            mcp_session.start()
+            self._sessions[server_name] = mcp_session
+            if stale is not None:
+                await stale.aclose()
+
+        return await mcp_session.session()
+
+    async def _with_session(self, server_name: str, operation, retry: bool = False):
+        """Run ``operation(session)`` on a server's persistent session.
+
+        If the connection turns out to be dead the session is reopened and the
+        operation tried once more. Other failures are only retried when
+        ``retry`` is set, since repeating a tool call could repeat its side effects.
+        """
+        session = None
+        try:
+            session = await self._get_session(server_name)
+            return await operation(session)
+        except Exception:
+            if not retry and session is not None and await self._session_responds(session):
+                raise
+            await self._close_session(server_name)
+            return await operation(await self._get_session(server_name))
+
+    @staticmethod
+    async def _session_responds(session: 'ClientSession') -> bool:
+        """Whether the server still answers a ping on this session."""
+        try:
+            await asyncio.wait_for(session.send_ping(), SESSION_PING_TIMEOUT)
+            return True
+        except Exception:
+            return False
+
+    async def _close_session(self, server_name: str):
+        """Close and forget a server's session, if it has one."""
+        mcp_session = self._sessions.pop(server_name, None)
+        if mcp_session is not None:
+            await mcp_session.aclose()
+
+    async def _close_all_sessions(self):
+        await asyncio.gather(*(self._close_session(name) for name in list(self._sessions)))
+
+    def close_sessions(self):
+        """Close every open MCP session, stopping stdio server processes."""
+        if not self._sessions:
+            return
+        try:
+            run_sync(self._close_all_sessions(), timeout=SESSION_CLOSE_TIMEOUT)
+        except Exception as e:
+            logger.warning("Failed to close MCP sessions: %s", e)
 
 # Global MCP manager instance
 mcp_manager = MCPManager()
@@ -0,0 +1,50 @@
+"""In-memory cache of final chat answers keyed by the exact prompt."""
+from collections import OrderedDict
+import hashlib
+import threading
+import time
+from typing import Optional
+
+
+class ResponseCache:
+    """Thread-safe LRU cache whose entries expire after a fixed TTL.
+
+    Keys hash the system prompt together with the user message, so a change to
+    the enabled tools or their instructions naturally misses.
+    """
+
+    def __init__(self, ttl: float, max_entries: int = 1024):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(system_content: str, user_message: str) -> str:
+        """Return the cache key for a prompt."""
+        digest = hashlib.blake2b(digest_size=16)
+        digest.update(system_content.encode())
+        digest.update(b'\0')
+        digest.update(user_message.encode())
+        return digest.hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        """Return the cached answer for a key, or None if missing or expired."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            expires_at, text = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return text
+
+    def set(self, key: str, text: str):
+        """Store an answer, evicting the least recently used entries past the limit."""
+        with self._lock:
+            self._entries[key] = (time.monotonic() + self.ttl, text)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
@@ -0,0 +1,134 @@
+"""Helpers for encoding Server-Sent Events frames."""
+
+import queue
+import threading
+import time
+
+import orjson
+
+# Content frames are emitted once per streamed chunk, so the JSON envelope is
+# pre-encoded and only the content string itself goes through the encoder.
+_CONTENT_PREFIX = b'data: {"content":'
+_FRAME_SUFFIX = b'}\n\n'
+
+# SSE comment lines are ignored by clients but keep idle proxies from closing
+# the connection while the provider has not produced anything yet
+KEEPALIVE_FRAME = b': keepalive\n\n'
+
+
+# Sent as soon as a stream opens so proxies and the client see the response
+# headers before the first token arrives
+OPEN_FRAME = b': ok\n\n'
+
+# The completion event is identical for every response
+DONE_FRAME = b'data: {"done":true}\n\n'
+
+
+def sse_event(obj) -> bytes:
+    """Encode an object as an SSE data frame."""
+    return b'data: ' + orjson.dumps(obj) + b'\n\n'
+
+
+def content_event(content: str) -> bytes:
+    """Encode a streamed content chunk as an SSE data frame."""
+    return _CONTENT_PREFIX + orjson.dumps(content) + _FRAME_SUFFIX
+
+
+class ContentBatcher:
+    """Coalesce small content chunks into fewer SSE frames.
+
+    The first frame carries ``min_batch`` chunks (one by default, so
+    time-to-first-token is unchanged). After every frame the batch size grows
+    by ``growth_factor`` up to ``max_batch``, so long responses amortize the
+    per-frame cost while the first tokens still appear immediately. A frame is
+    also sent whenever ``flush_ms`` milliseconds have passed since the last one.
+    """
+
+    def __init__(self, min_batch: int = 1, max_batch: int = 50,
+                 growth_factor: float = 3, flush_ms: float = 40):
+        self.min_batch = min_batch
+        self.max_batch = max_batch
+        self.growth_factor = growth_factor
+        self.flush_ms = flush_ms
+        self._batch_size = min_batch
+        self._parts = []
+        self._last_flush = time.monotonic()
+
+    def add(self, content: str) -> bytes | None:
+        """Buffer a chunk and return a frame if one is due, otherwise None."""
+        self._parts.append(content)
+
+        if (len(self._parts) >= self._batch_size
+                or (time.monotonic() - self._last_flush) * 1000 >= self.flush_ms):
+            return self.flush()
+        return None
+
+    def seconds_until_flush(self) -> float | None:
+        """Return how long until buffered content is due to be sent, or None if nothing is buffered."""
+        if not self._parts:
+            return None
+        return max(0.0, self.flush_ms / 1000 - (time.monotonic() - self._last_flush))
+
+    def flush(self) -> bytes | None:
+        """Return a frame with all buffered content, or None if nothing is buffered."""
+        if not self._parts:
+            return None
+
+        frame = content_event(''.join(self._parts))
+        self._parts = []
+        self._last_flush = time.monotonic()
+        self._batch_size = min(self.max_batch, max(self.min_batch, int(self._batch_size * self.growth_factor)))
+        return frame
+
+
+def with_keepalive(iterable, interval: float, deadline=None):
+    """Iterate over ``iterable``, yielding None whenever it has been idle for ``interval`` seconds.
+
+    The iterable is consumed in a background thread so the caller can send
+    keepalive frames while it waits, e.g. during a long time-to-first-token.
+    ``deadline`` may be a callable returning the seconds until the caller next
+    needs control (or None); a None is also yielded when that time passes, so
+    buffered output can be flushed while the iterable is stalled. Exceptions
+    raised by the iterable are re-raised in the caller. An interval of zero or
+    less disables keepalives.
+    """
+    if interval <= 0 and deadline is None:
+        yield from iterable
+        return
+
+    items = queue.Queue()
+    stop = threading.Event()
+
+    def produce():
+        try:
+            for item in iterable:
+                if stop.is_set():
+                    break
+                items.put(('item', item))
+            items.put(('done', None))
+        except BaseException as e:
+            items.put(('error', e))
+
+    threading.Thread(target=produce, daemon=True).start()
+
+    try:
+        while True:
+            timeout = interval if interval > 0 else None
+            due = deadline() if deadline is not None else None
+            if due is not None:
+                timeout = due if timeout is None else min(timeout, due)
+            try:
+                kind, value = items.get(timeout=timeout)
+            except queue.Empty:
+                yield None
+                continue
+
+            if kind == 'item':
+                yield value
+            elif kind == 'error':
+                raise value
+            else:
+                return
+    finally:
+        # Let the producer stop early if the client went away
+        stop.set()
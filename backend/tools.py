@@ -1,11 +1,27 @@
 from langchain_core.tools import tool, StructuredTool
 from typing import Optional, Any, Type
-import math
-import re
+import ast
 import asyncio
+import functools
+import logging
+import re
 import json
 from pydantic import BaseModel, Field, create_model
 from mcp_manager import mcp_manager
+from event_loop import get_loop, run_sync, submit
+
+logger = logging.getLogger(__name__)
+
+
+# JSON schema keywords carried over to the Pydantic Field, by Field argument name
+_SCHEMA_TO_FIELD = {
+    'description': 'description',
+    'minimum': 'ge',
+    'maximum': 'le',
+    'minLength': 'min_length',
+    'maxLength': 'max_length',
+    'default': 'default',
+}
 
 
 def json_schema_to_pydantic(schema: dict, model_name: str = "DynamicModel") -> Type[BaseModel]:
@@ -24,31 +40,37 @@ def json_schema_to_pydantic(schema: dict, model_name: str = "DynamicModel") -> T
     field_definitions = {}
 
     for prop_name, prop_schema in properties.items():
-        python_type = _json_type_to_python(prop_schema.get('type', 'string'))
+        json_type = prop_schema.get('type')
+        nullable = prop_schema.get('nullable', False)
+        variants = prop_schema.get('anyOf') or prop_schema.get('oneOf')
+        if json_type is None and variants:
+            # e.g. {"anyOf": [{"type": "string"}, {"type": "null"}]}
+            non_null = [v for v in variants if v.get('type') != 'null']
+            nullable = nullable or len(non_null) < len(variants)
+            json_type = non_null[0].get('type') if len(non_null) == 1 else None
+        elif json_type is None:
+            json_type = 'string'
+        if isinstance(json_type, list):
+            # e.g. ["string", "null"]
+            non_null_types = [t for t in json_type if t != 'null']
+            nullable = nullable or len(non_null_types) < len(json_type)
+            json_type = non_null_types[0] if len(non_null_types) == 1 else None
+        python_type = _json_type_to_python(json_type)
 
         # Build Field kwargs from schema constraints
-        field_kwargs = {}
-
-        if 'description' in prop_schema:
-            field_kwargs['description'] = prop_schema['description']
-
-        if 'minimum' in prop_schema:
-            field_kwargs['ge'] = prop_schema['minimum']
-
-        if 'maximum' in prop_schema:
-            field_kwargs['le'] = prop_schema['maximum']
-
-        if 'minLength' in prop_schema:
-            field_kwargs['min_length'] = prop_schema['minLength']
-
-        if 'maxLength' in prop_schema:
-            field_kwargs['max_length'] = prop_schema['maxLength']
-
-        # Handle default values
-        if 'default' in prop_schema:
-            field_kwargs['default'] = prop_schema['default']
-        elif prop_name not in required:
+        field_kwargs = {
+            field_key: prop_schema[schema_key]
+            for schema_key, field_key in _SCHEMA_TO_FIELD.items()
+            if schema_key in prop_schema
+        }
+
+        # Optional fields without a default of their own default to None, so
+        # they must accept it; a field with a schema default only does when
+        # the schema allows null
+        if 'default' not in field_kwargs and prop_name not in required:
             field_kwargs['default'] = None
+            nullable = True
+        if nullable:
             python_type = Optional[python_type]
 
         # Create the field definition tuple: (type, Field(...))
@@ -60,17 +82,19 @@ def json_schema_to_pydantic(schema: dict, model_name: str = "DynamicModel") -> T
     return create_model(model_name, **field_definitions)
 
 
+_JSON_TYPE_MAP = {
+    'string': str,
+    'integer': int,
+    'number': float,
+    'boolean': bool,
+    'array': list,
+    'object': dict,
+}
+
+
 def _json_type_to_python(json_type: str) -> type:
     """Map JSON schema type to Python type."""
-    type_map = {
-        'string': str,
-        'integer': int,
-        'number': float,
-        'boolean': bool,
-        'array': list,
-        'object': dict,
-    }
-    return type_map.get(json_type, Any)
+    return _JSON_TYPE_MAP.get(json_type, Any)
 
 @tool
 def web_search(query: str) -> str:
@@ -86,6 +110,28 @@ def web_search(query: str) -> str:
     # In production, you would integrate with a real search API
     return f"Search results for '{query}': This is a demonstration. In a real implementation, this would return actual search results from a search engine API."
 
+# Characters a calculator expression may contain: numbers, operators and parentheses
+_CALC_RE = re.compile(r'[\d\s+\-*/().^%]+')
+
+# Syntax nodes allowed in a calculator expression: arithmetic on numeric literals
+_CALC_NODES = (
+    ast.Expression, ast.BinOp, ast.UnaryOp, ast.Constant,
+    ast.Add, ast.Sub, ast.Mult, ast.Div, ast.FloorDiv, ast.Pow, ast.Mod,
+    ast.USub, ast.UAdd,
+)
+
+@functools.lru_cache(maxsize=512)
+def _compile_expression(expression: str):
+    """Parse and compile an arithmetic expression, once per distinct expression.
+
+    Raises ValueError if the expression contains anything but arithmetic on numbers.
+    """
+    tree = ast.parse(expression, mode='eval')
+    for node in ast.walk(tree):
+        if not isinstance(node, _CALC_NODES):
+            raise ValueError(f"unsupported syntax: {type(node).__name__}")
+    return compile(tree, '<calculator>', 'eval')
+
 @tool
 def calculator(expression: str) -> str:
     """Perform mathematical calculations.
@@ -98,15 +144,14 @@ def calculator(expression: str) -> str:
     """
     try:
         # Clean the expression - only allow numbers, operators, parentheses, and common functions
-        allowed = re.compile(r'^[\d\s\+\-\*/\(\)\.\^%]+$')
-        if not allowed.match(expression):
+        if not _CALC_RE.fullmatch(expression):
             return f"Error: Invalid expression. Only basic mathematical operations are allowed."
 
         # Replace ^ with ** for exponentiation
         expression = expression.replace('^', '**')
 
-        # Safely evaluate the expression
-        result = eval(expression, {"__builtins__": {}}, {"math": math})
+        # Evaluate the whitelisted, precompiled expression
+        result = eval(_compile_expression(expression), {"__builtins__": {}})
         return f"The result of {expression.replace('**', '^')} is {result}"
     except Exception as e:
         return f"Error calculating expression: {str(e)}"
@@ -147,6 +192,14 @@ TOOL_MAP = {
     'file_analyzer': file_analyzer
 }
 
+@functools.lru_cache(maxsize=256)
+def _args_schema(tool_name: str, tool_schema: str) -> Type[BaseModel]:
+    """Build the Pydantic args model for an MCP tool, once per distinct name and schema."""
+    schema_dict = json.loads(tool_schema)
+    # Create a unique model name based on the tool name
+    model_name = ''.join(word.capitalize() for word in tool_name.split('_')) + 'Args'
+    return json_schema_to_pydantic(schema_dict, model_name)
+
 def create_mcp_tool_wrapper(tool_config):
     """Create a LangChain tool wrapper for an MCP tool.
 
@@ -156,79 +209,79 @@ def create_mcp_tool_wrapper(tool_config):
     Returns:
         A LangChain StructuredTool
     """
-    server_name = tool_config['mcp_server_name']
+    return _build_mcp_tool_wrapper(
+        tool_config['name'],
+        tool_config['description'],
+        tool_config['mcp_server_name'],
+        tool_config.get('tool_schema'),
+    )
+
+@functools.lru_cache(maxsize=512)
+def _build_mcp_tool_wrapper(name: str, description: str, server_name: str,
+                            tool_schema: Optional[str]) -> StructuredTool:
+    """Build the StructuredTool for an MCP tool, once per distinct definition."""
     # Extract the actual tool name (remove server prefix)
-    tool_name = tool_config['name'].replace(f"{server_name}_", "")
+    tool_name = name.removeprefix(f"{server_name}_")
 
     def sync_mcp_call(**kwargs) -> str:
         """Synchronous wrapper for async MCP tool call."""
-        loop = asyncio.new_event_loop()
-        asyncio.set_event_loop(loop)
-        result = loop.run_until_complete(
-            mcp_manager.call_mcp_tool(server_name, tool_name, kwargs)
-        )
-        loop.close()
-        return result
+        return run_sync(mcp_manager.call_mcp_tool(server_name, tool_name, kwargs))
+
+    async def async_mcp_call(**kwargs) -> str:
+        """Async MCP tool call, so concurrent calls share the event loop instead of threads."""
+        coro = mcp_manager.call_mcp_tool(server_name, tool_name, kwargs)
+        # MCP sessions belong to the background loop; hop onto it from any other loop
+        if asyncio.get_running_loop() is get_loop():
+            return await coro
+        return await asyncio.wrap_future(submit(coro))
 
     # Parse schema and create Pydantic model if available
     args_schema = None
-    if tool_config.get('tool_schema'):
+    if tool_schema:
         try:
-            schema_dict = json.loads(tool_config['tool_schema'])
-            # Create a unique model name based on the tool name
-            model_name = ''.join(word.capitalize() for word in tool_config['name'].split('_')) + 'Args'
-            args_schema = json_schema_to_pydantic(schema_dict, model_name)
+            args_schema = _args_schema(name, tool_schema)
         except Exception as e:
             # Log but don't fail - tool will still work without schema
-            print(f"Warning: Could not parse schema for {tool_config['name']}: {e}")
+            logger.warning("Could not parse schema for %s: %s", name, e)
 
     return StructuredTool.from_function(
         func=sync_mcp_call,
-        name=tool_config['name'],
-        description=tool_config['description'],
+        coroutine=async_mcp_call,
+        name=name,
+        description=description,
         args_schema=args_schema,
     )
 
-def get_enabled_tools(tool_configs):
-    """Get enabled tools with their custom context applied.
+def prepare_tools(tool_configs):
+    """Get enabled tools and the context built from their custom prompts in one pass.
 
     Args:
         tool_configs: List of tool configuration dictionaries
 
     Returns:
-        List of enabled tool functions
+        Tuple of (enabled tool functions, custom context string for all enabled tools)
     """
     enabled_tools = []
+    context_parts = []
     for config in tool_configs:
         if not config['enabled']:
             continue
 
+        source = config.get('source')
+
         # Handle built-in tools
-        if config.get('source') == 'built-in' and config['name'] in TOOL_MAP:
-            tool_func = TOOL_MAP[config['name']]
-            enabled_tools.append(tool_func)
+        if source == 'built-in':
+            tool_func = TOOL_MAP.get(config['name'])
+            if tool_func is not None:
+                enabled_tools.append(tool_func)
 
         # Handle MCP tools
-        elif config.get('source') == 'mcp':
-            mcp_tool = create_mcp_tool_wrapper(config)
-            enabled_tools.append(mcp_tool)
-
-    return enabled_tools
+        elif source == 'mcp':
+            enabled_tools.append(create_mcp_tool_wrapper(config))
 
-def build_tool_context(tool_configs):
-    """Build additional context from custom tool prompts.
-
-    Args:
-        tool_configs: List of tool configuration dictionaries
-
-    Returns:
-        String containing custom context for all enabled tools
-    """
-    context_parts = []
-    for config in tool_configs:
-        if config['enabled'] and config.get('custom_context'):
-            context_parts.append(f"{config['name']}: {config['custom_context']}")
+        custom_context = config.get('custom_context')
+        if custom_context:
+            context_parts.append(f"{config['name']}: {custom_context}")
 
-    if context_parts:
-        return "Tool-specific instructions:\n" + "\n".join(context_parts)
-    return ""
+    tool_context = "Tool-specific instructions:\n" + "\n".join(context_parts) if context_parts else ""
+    return enabled_tools, tool_context
@@ -0,0 +1,9 @@
+"""WSGI entrypoint for running the backend under Gunicorn with gevent workers."""
+
+from gevent import monkey
+
+# Patch socket/ssl/select before flask, requests or the LLM SDKs are imported so
+# that streaming provider calls yield to other greenlets instead of blocking.
+monkey.patch_all()
+
+from app import app  # noqa: E402
@@ -104,6 +104,25 @@ export default function Home() {
     }
   };
 
+  // MCP tool syncs run in the background; poll until the task finishes
+  const waitForSyncTask = async (taskId: string) => {
+    for (let attempt = 0; attempt < 120; attempt++) {
+      const response = await fetch(`http://localhost:3001/mcp-servers/sync/${taskId}`, {
+        headers: getAuthHeaders(),
+      });
+      if (!response.ok) {
+        console.error('Error checking MCP sync status:', response.status);
+        return;
+      }
+      const task = await response.json();
+      if (task.status === 'completed' || task.status === 'failed') {
+        if (task.error) console.error('Error syncing MCP tools:', task.error);
+        return;
+      }
+      await new Promise(resolve => setTimeout(resolve, 500));
+    }
+  };
+
   const handleAddMcpServer = async () => {
     if (!newServerName) return;
     if (newServerTransport === 'stdio' && !newServerCommand) return;
@@ -132,7 +151,9 @@ export default function Home() {
       });
 
       if (response.ok) {
+        const data = await response.json();
         await fetchMcpServers();
+        if (data.task_id) await waitForSyncTask(data.task_id);
         await fetchTools();
         setShowMcpModal(false);
         setNewServerName('');
@@ -172,6 +193,8 @@ export default function Home() {
       });
 
       if (response.ok) {
+        const data = await response.json();
+        if (data.task_id) await waitForSyncTask(data.task_id);
         await fetchTools();
       }
     } catch (error) {
@@ -264,13 +287,16 @@ export default function Home() {
       }
 
       let accumulatedContent = '';
+      let buffered = '';
 
       while (true) {
         const { done, value } = await reader.read();
         if (done) break;
 
-        const chunk = decoder.decode(value);
-        const lines = chunk.split('\n');
+        // Reads can end mid-character or mid-line, so keep the partial tail for the next read
+        buffered += decoder.decode(value, { stream: true });
+        const lines = buffered.split('\n');
+        buffered = lines.pop() ?? '';
 
         for (const line of lines) {
           if (line.startsWith('data: ')) {